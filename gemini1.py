@@ -1,8 +1,34 @@
 import streamlit as st
-import json
-import requests
+import orjson # Rust-backed JSON parser/serializer, faster than the json module
+import httpx
+import asyncio
+import queue
+import ijson # Incremental JSON parser, used to pick complete fields out of a streamed response
 import io
+import re
+import hashlib
+import hmac
+import html
+import logging
+import sqlite3
+import uuid
+import threading
+import time
+from typing import Final
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import diskcache
+try:
+    import redis # Only needed when summaries are shared through Redis
+except ImportError:
+    redis = None
+import fastjsonschema
 import PyPDF2 # Import PyPDF2 for PDF handling
+try:
+    import pymupdf # MuPDF's C engine, much faster than PyPDF2 at text extraction
+except ImportError:
+    pymupdf = None # Fall back to PyPDF2
 import os # Import os for accessing environment variables (used by st.secrets internally)
 
 # --- Configuration ---
@@ -17,16 +43,54 @@ except KeyError:
         st.error("Gemini API key not found. Please set it in Streamlit secrets or as an environment variable.")
         st.stop() # Stop the app if API key is missing
 
-# Function to call the Gemini API for summarization
-def summarize_document(document_text: str):
-    """
-    Summarizes the provided document text using the Gemini 2.0 Flash model,
-    extracting coverages, exclusions, and policy details in a structured JSON format.
-    """
-    st.info("Analyzing document and generating summary...")
+# Optional Redis URL for sharing cached summaries across app replicas
+try:
+    REDIS_URL = st.secrets["REDIS_URL"]
+except (KeyError, FileNotFoundError):
+    REDIS_URL = os.getenv("REDIS_URL")
+
+# Optional token that unlocks clearing the summary caches shared by all users
+try:
+    ADMIN_TOKEN = st.secrets["ADMIN_TOKEN"]
+except (KeyError, FileNotFoundError):
+    ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+GEMINI_MODEL = "gemini-2.0-flash"
+# Bump whenever the prompt or response schema changes so stale cached summaries are not reused
+PROMPT_VERSION = "v1"
+SUMMARY_CACHE_TTL = 7 * 86400 # Cached summaries expire after one week
+# Private to the user running the app, unlike the shared temp dir
+APP_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "insurance_summarizer")
+SUMMARY_CACHE_DIR = os.path.join(APP_CACHE_DIR, "summaries")
+SUMMARY_CACHE_SIZE_LIMIT = 2 ** 30 # Bytes of disk the summary cache may use
+REDIS_KEY_PREFIX = "insurance_summarizer:summary:"
+
+# JSON Schema (draft-7) version of the Gemini responseSchema, used to validate parsed summaries locally
+SUMMARY_JSON_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "summary": {"type": "string"},
+        "coverages": {"type": "array", "items": {"type": "string"}},
+        "exclusions": {"type": "array", "items": {"type": "string"}},
+        "policyDetails": {
+            "type": "object",
+            "properties": {
+                "policyNumber": {"type": "string"},
+                "policyHolder": {"type": "string"},
+                "effectiveDate": {"type": "string"},
+                "expirationDate": {"type": "string"},
+                "premium": {"type": "string"},
+                "otherDetails": {"type": "array", "items": {"type": "string"}}
+            }
+        }
+    },
+    "required": ["summary", "coverages", "exclusions", "policyDetails"]
+}
+# Compiled once per process into a specialized validator function
+_validate_summary = fastjsonschema.compile(SUMMARY_JSON_SCHEMA)
 
-    chat_history = []
-    prompt = f"""
+# Prompts are split around the inserted text so building one is a single concatenation
+_SUMMARY_PROMPT_PREFIX: Final[str] = """
     You are an AI assistant specialized in summarizing insurance documents.
     Please read the following insurance document and extract the following information in a structured JSON format:
     1.  A concise overall 'summary' of the document.
@@ -45,179 +109,826 @@ def summarize_document(document_text: str):
 
     Document:
     ---
-    {document_text}
+    """
+_SUMMARY_PROMPT_SUFFIX: Final[str] = """
     ---
     """
-    chat_history.append({
-        "role": "user",
-        "parts": [{"text": prompt}]
-    })
-
-    payload = {
-        "contents": chat_history,
-        "generationConfig": {
-            "responseMimeType": "application/json",
-            "responseSchema": {
-                "type": "OBJECT",
-                "properties": {
-                    "summary": {"type": "STRING"},
-                    "coverages": {
-                        "type": "ARRAY",
-                        "items": {"type": "STRING"}
-                    },
-                    "exclusions": {
-                        "type": "ARRAY",
-                        "items": {"type": "STRING"}
-                    },
-                    "policyDetails": {
-                        "type": "OBJECT",
-                        "properties": {
-                            "policyNumber": {"type": "STRING"},
-                            "policyHolder": {"type": "STRING"},
-                            "effectiveDate": {"type": "STRING"},
-                            "expirationDate": {"type": "STRING"},
-                            "premium": {"type": "STRING"},
-                            "otherDetails": {
-                                "type": "ARRAY",
-                                "items": {"type": "STRING"}
-                            }
-                        },
-                        "propertyOrdering": ["policyNumber", "policyHolder", "effectiveDate", "expirationDate", "premium", "otherDetails"]
-                    }
+
+_MERGE_PROMPT_PREFIX: Final[str] = """
+    You are an AI assistant specialized in summarizing insurance documents.
+    Each of the following JSON objects summarizes one consecutive part of the same insurance document.
+    Merge them into a single summary of the whole document with the same structure:
+    1.  One concise overall 'summary' covering all parts.
+    2.  The combined 'coverages' list, without duplicates.
+    3.  The combined 'exclusions' list, without duplicates.
+    4.  'policyDetails' taken from whichever part contains each detail, with the 'otherDetails' lists combined.
+
+    Only use "N/A" for a string if no part contains that information.
+    Ensure the output is valid JSON.
+
+    Partial summaries:
+    ---
+    """
+_MERGE_PROMPT_SUFFIX: Final[str] = """
+    ---
+    """
+
+# Used on semantic cache hits, where only the parts specific to this one policy are generated
+_DETAILS_PROMPT_PREFIX: Final[str] = """
+    You are an AI assistant specialized in summarizing insurance documents.
+    Please read the following insurance document and extract the following information in a structured JSON format:
+    1.  A concise overall 'summary' of the document.
+    2.  'policyDetails' as an object containing:
+        -   'policyNumber' (if found)
+        -   'policyHolder' (if found)
+        -   'effectiveDate' (if found, e.g., "YYYY-MM-DD")
+        -   'expirationDate' (if found, e.g., "YYYY-MM-DD")
+        -   'premium' (if found, e.g., "USD 1200" or "1200 per year")
+        -   'otherDetails' (a list of any other significant policy details).
+
+    If a piece of information is not explicitly found, use "N/A" for strings or an empty list for arrays.
+    Ensure the output is valid JSON.
+
+    Document:
+    ---
+    """
+
+# Request body shared by every summary call, built once at import; only "contents" varies per call
+_BASE_PAYLOAD = {
+    "contents": None,
+    "generationConfig": {
+        "responseMimeType": "application/json",
+        "responseSchema": {
+            "type": "OBJECT",
+            "properties": {
+                "summary": {"type": "STRING"},
+                "coverages": {
+                    "type": "ARRAY",
+                    "items": {"type": "STRING"}
                 },
-                "propertyOrdering": ["summary", "coverages", "exclusions", "policyDetails"]
-            }
+                "exclusions": {
+                    "type": "ARRAY",
+                    "items": {"type": "STRING"}
+                },
+                "policyDetails": {
+                    "type": "OBJECT",
+                    "properties": {
+                        "policyNumber": {"type": "STRING"},
+                        "policyHolder": {"type": "STRING"},
+                        "effectiveDate": {"type": "STRING"},
+                        "expirationDate": {"type": "STRING"},
+                        "premium": {"type": "STRING"},
+                        "otherDetails": {
+                            "type": "ARRAY",
+                            "items": {"type": "STRING"}
+                        }
+                    },
+                    "propertyOrdering": ["policyNumber", "policyHolder", "effectiveDate", "expirationDate", "premium", "otherDetails"]
+                }
+            },
+            "propertyOrdering": ["summary", "coverages", "exclusions", "policyDetails"],
+            "required": ["summary", "coverages", "exclusions", "policyDetails"]
         }
     }
+}
 
-    # Use the securely fetched API key
-    api_url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent?key={GEMINI_API_KEY}"
+# Fields that identify one policy holder; they are never reused from a near-duplicate document
+POLICY_SPECIFIC_FIELDS = ("summary", "policyDetails")
+_DETAILS_PAYLOAD = {
+    "contents": None,
+    "generationConfig": {
+        "responseMimeType": "application/json",
+        "responseSchema": {
+            "type": "OBJECT",
+            "properties": {
+                name: _BASE_PAYLOAD["generationConfig"]["responseSchema"]["properties"][name]
+                for name in POLICY_SPECIFIC_FIELDS
+            },
+            "propertyOrdering": list(POLICY_SPECIFIC_FIELDS),
+            "required": list(POLICY_SPECIFIC_FIELDS)
+        }
+    }
+}
+_validate_details = fastjsonschema.compile({**SUMMARY_JSON_SCHEMA, "required": list(POLICY_SPECIFIC_FIELDS)})
 
-    try:
-        response = requests.post(api_url, headers={'Content-Type': 'application/json'}, json=payload)
-        response.raise_for_status() # Raise an exception for HTTP errors
-        result = response.json()
-
-        if result.get("candidates") and result["candidates"][0].get("content") and result["candidates"][0]["content"].get("parts"):
-            json_string = result["candidates"][0]["content"]["parts"][0]["text"]
-            # The API might return the JSON string with markdown backticks, remove them if present
-            if json_string.startswith("```json") and json_string.endswith("```"):
-                json_string = json_string[7:-3].strip()
-            return json.loads(json_string)
+EMBEDDING_MODEL = "text-embedding-004"
+EMBEDDING_DIM = 768
+EMBEDDING_MAX_CHARS = 8000 # Documents are embedded in pieces of this size, all in one batch request
+# Two documents count as duplicates when every piece is at least this similar to the matching piece
+SEMANTIC_SIMILARITY_THRESHOLD = 0.95
+SEMANTIC_CACHE_MAX_ENTRIES = 1000 # Oldest entries are evicted beyond this; they also expire after SUMMARY_CACHE_TTL
+SEMANTIC_CACHE_DIR = os.path.join(APP_CACHE_DIR, f"semantic_{PROMPT_VERSION}")
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504}) # Gemini responses worth retrying
+MAX_RETRIES = 3
+RETRY_BACKOFF = 0.3 # Seconds; doubled on every retry
+CHUNK_THRESHOLD_CHARS = 50_000 # Longer documents are summarized in parallel chunks and then merged
+CHUNK_SIZE = 8000
+CHUNK_OVERLAP = 400 # Characters shared by neighbouring chunks so no clause is cut in half unseen
+MAX_CONCURRENT_CHUNKS = 4 # Chunk requests in flight at once per document, to stay clear of rate limits
+
+PDF_MAX_WORKERS = 8 # Upper bound on threads used to extract PDF pages in parallel
+MAX_DOCUMENT_CHARS = 120_000 # Character budget sent to the model, applied to the normalized text
+# Raw PDF extraction stops here; normalization usually shrinks the text, so it gets some headroom
+PDF_MAX_CHARS = 4 * MAX_DOCUMENT_CHARS
+PDF_CACHE_ENTRIES = 32 # Extracted texts kept for re-uploaded PDFs
+PAGE_SEPARATOR = "\f" # Joins extracted pages so normalization can still tell them apart
+BOILERPLATE_PAGE_RATIO = 0.3 # Edge lines found on more pages than this are treated as headers/footers
+BOILERPLATE_MIN_REPEATS = 3 # ...as long as they are found on at least this many pages
+BOILERPLATE_EDGE_LINES = 2 # Non-empty lines at the top and at the bottom of a page that may be a header/footer
+BOILERPLATE_MIN_PAGES = 5 # Too few pages to tell boilerplate from content
+
+_SPACES = re.compile(r"[ \t]+")
+_BLANK_LINES = re.compile(r"\n\s*\n")
+
+# Gemini calls run on one long-lived event loop in a background thread. A fresh loop per
+# asyncio.run() would orphan the pooled connections of the shared client below.
+@st.cache_resource(show_spinner=False)
+def _event_loop():
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return loop
+
+# One pooled HTTP/2 client shared across summaries, so keep-alive connections skip the TCP/TLS
+# handshake and the parallel chunk requests of long documents share a single connection
+@st.cache_resource(show_spinner=False)
+def _client():
+    return httpx.AsyncClient(
+        http2=True,
+        timeout=60.0,
+        limits=httpx.Limits(max_keepalive_connections=4),
+        headers={'Content-Type': 'application/json'}
+    )
+
+def _run(coro, events=None, on_event=None):
+    """
+    Runs a coroutine on the background event loop and waits for its result. Tuples the
+    coroutine puts on the events queue are passed to on_event on the calling thread, which
+    is the only thread allowed to update Streamlit elements.
+    """
+    future = asyncio.run_coroutine_threadsafe(coro, _event_loop())
+    if on_event is not None:
+        # Events are queued before the coroutine finishes, so none are left once both checks pass
+        while not (future.done() and events.empty()):
+            try:
+                on_event(*events.get(timeout=0.05))
+            except queue.Empty:
+                pass
+    return future.result()
+
+async def _post(api_url: str, payload: dict, retries: int = MAX_RETRIES):
+    """
+    POSTs the payload to the Gemini API and returns the parsed JSON response,
+    retrying connection failures, rate-limited and server-error responses with exponential backoff.
+    """
+    body = orjson.dumps(payload)
+    for attempt in range(retries + 1):
+        try:
+            response = await _client().post(api_url, content=body)
+        except httpx.TransportError:
+            if attempt == retries:
+                raise
         else:
-            st.error("Error: Could not get a valid response from the summarization model.")
-            st.json(result) # Show the raw result for debugging
+            if response.status_code not in RETRY_STATUSES or attempt == retries:
+                response.raise_for_status() # Raise an exception for HTTP errors
+                return orjson.loads(response.content)
+        await asyncio.sleep(RETRY_BACKOFF * 2 ** attempt)
+
+async def _stream(api_url: str, payload: dict, on_field):
+    """
+    Streams the model's answer over Server-Sent Events and returns the full answer text together
+    with the last response chunk. Every top-level field of the JSON answer is passed to
+    on_field(name, value) as soon as it is complete. Failures are retried like in _post.
+    """
+    body = orjson.dumps(payload)
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            async with _client().stream("POST", api_url, content=body) as response:
+                if response.status_code in RETRY_STATUSES and attempt < MAX_RETRIES:
+                    await asyncio.sleep(RETRY_BACKOFF * 2 ** attempt)
+                    continue
+                if response.is_error:
+                    await response.aread() # Load the error body so it can be reported
+                response.raise_for_status() # Raise an exception for HTTP errors
+
+                fields = ijson.sendable_list()
+                parser = ijson.kvitems_coro(fields, "")
+                parsing = True
+                parts = []
+                result = {}
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    result = orjson.loads(line[5:])
+                    text = _candidate_text(result)
+                    if not text:
+                        continue
+                    parts.append(text)
+                    if parsing:
+                        try:
+                            parser.send(text.encode())
+                        except ijson.JSONError:
+                            parsing = False # Not plain JSON (e.g. fenced); the full text is still parsed afterwards
+                        for name, value in fields:
+                            on_field(name, value)
+                        del fields[:]
+                return "".join(parts), result
+        except httpx.TransportError:
+            # Failed connections and streams cut off midway are retried like the retryable statuses
+            if attempt == MAX_RETRIES:
+                raise
+            await asyncio.sleep(RETRY_BACKOFF * 2 ** attempt)
+
+def _candidate_text(result: dict):
+    """
+    Returns the text of the first candidate in a Gemini response, or None if there is none.
+    """
+    if result.get("candidates") and result["candidates"][0].get("content") and result["candidates"][0]["content"].get("parts"):
+        return result["candidates"][0]["content"]["parts"][0].get("text")
+    return None
+
+class ModelResponseError(Exception):
+    """
+    Raised when the Gemini API answers without any candidate content.
+    Keeps the raw response around so it can be shown for debugging.
+    """
+    def __init__(self, result):
+        super().__init__("Could not get a valid response from the summarization model.")
+        self.result = result
+
+class SemanticCache:
+    """
+    Near-duplicate cache for the policy-wide parts of a summary (coverages and exclusions).
+    A document is stored as the L2-normalized embeddings of its pieces, so row-wise dot products
+    give the cosine similarity of every piece to the matching piece of a cached document. Each
+    entry is its own .npy/.json file pair, so worker processes sharing the directory never
+    overwrite each other and pick up each other's entries. Entries expire after ttl seconds and
+    the oldest are evicted beyond max_entries. All methods do disk I/O; call them from a worker
+    thread rather than the event loop.
+    """
+    def __init__(self, directory: str, dim: int = EMBEDDING_DIM, ttl: float = SUMMARY_CACHE_TTL,
+                 max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES):
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        self.directory = directory
+        self.dim = dim
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = {} # Entry id -> (creation time, embeddings, cached fields)
+        self._listing_mtime = None
+        self._lock = threading.Lock() # The cache instance is shared by all Streamlit sessions
+
+    def lookup(self, query: np.ndarray):
+        """
+        Returns the cached fields of a document with as many pieces as query, each at least
+        SEMANTIC_SIMILARITY_THRESHOLD similar to the matching query piece, or None if there is none.
+        """
+        with self._lock:
+            self._refresh()
+            best, best_similarity = None, SEMANTIC_SIMILARITY_THRESHOLD
+            for _, embeddings, entry in self.entries.values():
+                if embeddings.shape != query.shape:
+                    continue
+                similarity = float(np.einsum("ij,ij->i", embeddings, query).min())
+                if similarity >= best_similarity:
+                    best, best_similarity = entry, similarity
+            return best
+
+    def add(self, query: np.ndarray, entry: dict):
+        path = os.path.join(self.directory, uuid.uuid4().hex)
+        buf = io.BytesIO()
+        np.save(buf, query.astype(np.float32), allow_pickle=False)
+        with self._lock:
+            # The .npy file is written last, so its presence marks a complete entry
+            self._write(f"{path}.json", orjson.dumps(entry))
+            self._write(f"{path}.npy", buf.getvalue())
+            self._refresh()
+            if len(self.entries) > self.max_entries:
+                oldest = sorted(self.entries, key=lambda entry_id: self.entries[entry_id][0])
+                for entry_id in oldest[:len(self.entries) - self.max_entries]:
+                    self._remove(entry_id)
+
+    def clear(self):
+        with self._lock:
+            for name in os.listdir(self.directory):
+                self._unlink(os.path.join(self.directory, name))
+            self.entries = {}
+            self._listing_mtime = None
+
+    def _refresh(self):
+        # The directory is only listed again when files were added or removed, by this process or another
+        try:
+            listing_mtime = os.stat(self.directory).st_mtime_ns
+        except OSError:
+            return
+        if listing_mtime != self._listing_mtime:
+            self._listing_mtime = listing_mtime
+            on_disk = set()
+            for name in os.listdir(self.directory):
+                entry_id, ext = os.path.splitext(name)
+                if ext != ".npy":
+                    continue
+                on_disk.add(entry_id)
+                if entry_id in self.entries:
+                    continue
+                npy_path = os.path.join(self.directory, name)
+                try:
+                    created = os.stat(npy_path).st_mtime
+                    embeddings = np.load(npy_path, allow_pickle=False)
+                    with open(os.path.join(self.directory, f"{entry_id}.json"), "rb") as f:
+                        entry = orjson.loads(f.read())
+                except (OSError, ValueError):
+                    continue # Removed meanwhile or unreadable
+                if embeddings.ndim == 2 and embeddings.shape[1] == self.dim:
+                    self.entries[entry_id] = (created, embeddings, entry)
+            for entry_id in self.entries.keys() - on_disk:
+                del self.entries[entry_id]
+        expired = [entry_id for entry_id, (created, _, _) in self.entries.items() if time.time() - created > self.ttl]
+        for entry_id in expired:
+            self._remove(entry_id)
+
+    def _remove(self, entry_id: str):
+        del self.entries[entry_id]
+        path = os.path.join(self.directory, entry_id)
+        self._unlink(f"{path}.npy")
+        self._unlink(f"{path}.json")
+
+    @staticmethod
+    def _unlink(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass # Already removed by another process
+
+    @staticmethod
+    def _write(path: str, data: bytes):
+        # Write to a temporary file first so readers never see a partial file
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+class RedisSummaryCache:
+    """
+    Redis-backed summary store exposing the get/set/clear subset of the diskcache.Cache API.
+    Redis errors are treated as cache misses so an outage never blocks summarization.
+    """
+    def __init__(self, url: str):
+        self._redis = redis.Redis.from_url(url)
+
+    def get(self, key: str):
+        try:
+            value = self._redis.get(REDIS_KEY_PREFIX + key)
+            return orjson.loads(value) if value is not None else None
+        except (redis.RedisError, orjson.JSONDecodeError):
             return None
-    except requests.exceptions.RequestException as e:
+
+    def set(self, key: str, value: dict, expire=None):
+        try:
+            self._redis.set(REDIS_KEY_PREFIX + key, orjson.dumps(value), ex=expire)
+        except redis.RedisError:
+            pass
+
+    def clear(self):
+        try:
+            keys = list(self._redis.scan_iter(match=f"{REDIS_KEY_PREFIX}*"))
+            if keys:
+                self._redis.delete(*keys)
+        except redis.RedisError:
+            pass
+
+class DiskSummaryCache:
+    """
+    diskcache-backed summary store with the same get/set/clear API as RedisSummaryCache.
+    Database and disk errors (a locked sqlite file, a full disk) are treated as cache misses.
+    """
+    def __init__(self, directory: str, size_limit: int):
+        self._cache = diskcache.Cache(directory, size_limit=size_limit)
+
+    def get(self, key: str):
+        try:
+            return self._cache.get(key)
+        except (sqlite3.Error, OSError, diskcache.Timeout):
+            return None
+
+    def set(self, key: str, value: dict, expire=None):
+        try:
+            self._cache.set(key, value, expire=expire)
+        except (sqlite3.Error, OSError, diskcache.Timeout):
+            pass
+
+    def clear(self):
+        self._cache.clear()
+
+# Summaries are shared by every worker process: through Redis across replicas when it is
+# configured, otherwise through an on-disk cache shared by the processes on this machine
+@st.cache_resource(show_spinner=False)
+def _summary_cache():
+    if REDIS_URL:
+        if redis is not None:
+            return RedisSummaryCache(REDIS_URL)
+        logging.getLogger(__name__).warning("REDIS_URL is set but the redis package is not installed; using the local disk cache")
+    os.makedirs(SUMMARY_CACHE_DIR, mode=0o700, exist_ok=True)
+    return DiskSummaryCache(SUMMARY_CACHE_DIR, SUMMARY_CACHE_SIZE_LIMIT)
+
+@st.cache_resource(show_spinner=False)
+def _semantic_cache():
+    return SemanticCache(SEMANTIC_CACHE_DIR)
+
+async def _embed_document(document_text: str):
+    """
+    Returns the L2-normalized Gemini embeddings of the whole document, one row per
+    EMBEDDING_MAX_CHARS piece, or None if they could not be computed (the semantic cache is
+    then skipped). The pieces are embedded in one batch request that is not retried, so a
+    cache miss costs at most one extra round trip.
+    """
+    pieces = _chunk(document_text, EMBEDDING_MAX_CHARS, 0)
+    api_url = f"https://generativelanguage.googleapis.com/v1beta/models/{EMBEDDING_MODEL}:batchEmbedContents?key={GEMINI_API_KEY}"
+    payload = {"requests": [{
+        "model": f"models/{EMBEDDING_MODEL}",
+        "content": {"parts": [{"text": piece}]}
+    } for piece in pieces]}
+    try:
+        result = await _post(api_url, payload, retries=0)
+        embeddings = np.asarray([embedding["values"] for embedding in result["embeddings"]], dtype=np.float32)
+    except (httpx.HTTPError, KeyError, TypeError, ValueError):
+        return None
+    if embeddings.shape != (len(pieces), EMBEDDING_DIM):
+        return None
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    if not norms.all():
+        return None
+    return embeddings / norms
+
+# Function to call the Gemini API for summarization
+def summarize_document(document_text: str, on_field=None):
+    """
+    Summarizes the provided document text using the Gemini 2.0 Flash model,
+    extracting coverages, exclusions, and policy details in a structured JSON format.
+    Identical documents are served from the summary cache and near-duplicates from the
+    semantic cache instead of calling the API again. For freshly generated summaries,
+    on_field(name, value) is called for every field as soon as it has been streamed.
+    """
+    st.info("Analyzing document and generating summary...")
+
+    key = hashlib.sha256(f"{PROMPT_VERSION}|{GEMINI_MODEL}|{document_text}".encode()).hexdigest()
+    summary_cache = _summary_cache()
+    cache_stats = st.session_state.setdefault("cache_stats", {"hits": 0, "misses": 0})
+    summary = summary_cache.get(key)
+    if summary is not None:
+        cache_stats["hits"] += 1
+        return summary
+    cache_stats["misses"] += 1
+
+    streamed_fields = queue.Queue()
+    try:
+        summary = _run(
+            _summarize_async(document_text, (lambda name, value: streamed_fields.put((name, value))) if on_field else None),
+            streamed_fields,
+            on_field
+        )
+    except ModelResponseError as e:
+        st.error("Error: Could not get a valid response from the summarization model.")
+        st.json(e.result) # Show the raw result for debugging
+        return None
+    except httpx.HTTPError as e:
         st.error(f"Network or API error: {e}")
         return None
-    except json.JSONDecodeError as e:
+    except orjson.JSONDecodeError as e:
         st.error(f"Error decoding JSON response from model: {e}")
-        st.text(response.text) # Show the raw text response for debugging
+        st.text(e.doc) # Show the raw text response for debugging
+        return None
+    except fastjsonschema.JsonSchemaException as e:
+        st.error(f"The model's response did not have the expected structure: {e.message}")
         return None
     except Exception as e:
         st.error(f"An unexpected error occurred: {e}")
         return None
+    # Only successful summaries are cached
+    summary_cache.set(key, summary, expire=SUMMARY_CACHE_TTL)
+    return summary
+
+async def _summarize_async(document_text: str, on_field=None):
+    """
+    Summarizes the document, reusing the coverages and exclusions of a near-duplicate document
+    when the semantic cache has one. on_field is passed on to the request that produces the final summary.
+    """
+    semantic_cache = _semantic_cache()
+    query = await _embed_document(document_text)
+    if query is not None:
+        # The cache does disk I/O, which must not stall the event loop shared by all sessions
+        cached = await asyncio.to_thread(semantic_cache.lookup, query)
+        if cached is not None:
+            # Every piece of the document matched, schedules and endorsements included, so the
+            # coverages and exclusions carry over. The summary and policy details belong to one
+            # policy holder and always come from this document; a hit still saves generating the
+            # coverage and exclusion lists and, for long documents, every chunk request.
+            details = await _generate_summary(_details_prompt(document_text), on_field, _DETAILS_PAYLOAD, _validate_details)
+            return {
+                "summary": details["summary"],
+                "coverages": cached["coverages"],
+                "exclusions": cached["exclusions"],
+                "policyDetails": details["policyDetails"]
+            }
+
+    summary = await _summarize_text(document_text, on_field)
+    if query is not None:
+        await asyncio.to_thread(semantic_cache.add, query, {"coverages": summary["coverages"], "exclusions": summary["exclusions"]})
+    return summary
+
+async def _summarize_text(document_text: str, on_field=None):
+    """
+    Summarizes short documents with a single request. Long documents are map-reduced:
+    overlapping chunks are summarized concurrently (at most MAX_CONCURRENT_CHUNKS at a time) and
+    one final request merges the partial summaries, which are much shorter than the original text.
+    """
+    if len(document_text) <= CHUNK_THRESHOLD_CHARS:
+        return await _generate_summary(_summary_prompt(document_text), on_field)
+
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_CHUNKS)
+    partial_summaries = await asyncio.gather(*(_partial(chunk, semaphore) for chunk in _chunk(document_text)))
+    return await _generate_summary(_merge_prompt(partial_summaries), on_field)
+
+def _chunk(text: str, size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP):
+    """
+    Splits the text into chunks of at most size characters, each starting overlap
+    characters before the end of the previous one.
+    """
+    return [text[start:start + size] for start in range(0, max(len(text) - overlap, 1), size - overlap)]
+
+async def _partial(chunk: str, semaphore: asyncio.Semaphore):
+    async with semaphore:
+        return await _generate_summary(_summary_prompt(chunk))
+
+def _summary_prompt(document_text: str) -> str:
+    return _SUMMARY_PROMPT_PREFIX + document_text + _SUMMARY_PROMPT_SUFFIX
+
+def _details_prompt(document_text: str) -> str:
+    return _DETAILS_PROMPT_PREFIX + document_text + _SUMMARY_PROMPT_SUFFIX
+
+def _merge_prompt(partial_summaries) -> str:
+    partials = "\n".join(orjson.dumps(partial).decode() for partial in partial_summaries)
+    return _MERGE_PROMPT_PREFIX + partials + _MERGE_PROMPT_SUFFIX
+
+async def _generate_summary(prompt: str, on_field=None, base_payload=_BASE_PAYLOAD, validate=_validate_summary):
+    """
+    Sends the prompt to the Gemini API and returns the parsed summary dict, checked with validate.
+    If on_field is given, the response is streamed and on_field(name, value) is called for every
+    field as soon as it has been generated.
+    """
+    chat_history = [{
+        "role": "user",
+        "parts": [{"text": prompt}]
+    }]
+
+    payload = base_payload.copy() # Shallow copy; the shared generationConfig is never mutated
+    payload["contents"] = chat_history
+
+    # Use the securely fetched API key
+    api_url = f"https://generativelanguage.googleapis.com/v1beta/models/{GEMINI_MODEL}:generateContent?key={GEMINI_API_KEY}"
+    stream_url = f"https://generativelanguage.googleapis.com/v1beta/models/{GEMINI_MODEL}:streamGenerateContent?alt=sse&key={GEMINI_API_KEY}"
+
+    # A response that does not match the schema is retried once with a clarifying follow-up message
+    for attempt in range(2):
+        if on_field is None:
+            result = await _post(api_url, payload)
+            json_string = _candidate_text(result)
+        else:
+            json_string, result = await _stream(stream_url, payload, on_field)
+        if not json_string:
+            raise ModelResponseError(result)
+        # Parse from the first "{" to the last "}", which drops markdown fences, whitespace and
+        # any commentary around the object in one slice. Without braces, parse as-is for the error.
+        start = json_string.find("{")
+        end = json_string.rfind("}") + 1
+        summary = orjson.loads(json_string[start:end] if start != -1 and end > start else json_string)
+        try:
+            validate(summary)
+            return summary
+        except fastjsonschema.JsonSchemaException as e:
+            if attempt:
+                raise
+            chat_history.append({"role": "model", "parts": [{"text": json_string}]})
+            chat_history.append({
+                "role": "user",
+                "parts": [{"text": f"Your response did not match the required structure ({e.message}). "
+                                   "Reply again with only the JSON object in the requested structure."}]
+            })
+
+# Each extraction thread keeps its own PdfReader, since a reader shares one stream across pages
+_pdf_worker = threading.local()
+
+def _init_pdf_worker(data: bytes):
+    _pdf_worker.reader = PyPDF2.PdfReader(io.BytesIO(data))
+
+def _extract_page_text(page_num: int) -> str:
+    return _pdf_worker.reader.pages[page_num].extract_text() or ""
 
 # Function to extract text from PDF files
-def extract_text_from_pdf(uploaded_file):
+def extract_text_from_pdf(uploaded_file, on_page=None):
+    """
+    Yields the text content of an uploaded PDF file page by page, so only the pages that
+    are actually consumed get extracted. Uses PyMuPDF when it is installed and otherwise
+    extracts pages with PyPDF2 in parallel threads. If given, on_page(done, total) is called
+    after every page. Errors reading the file are raised to the caller.
+    """
+    data = uploaded_file.getvalue()
+    doc = None
+    if pymupdf is not None:
+        try:
+            doc = pymupdf.open(stream=data, filetype="pdf")
+        except pymupdf.FileDataError:
+            pass # MuPDF could not parse the file, give PyPDF2 a try
+    if doc is not None:
+        # MuPDF documents must not be shared between threads, so pages are read in order
+        with doc:
+            for page_num, page in enumerate(doc, 1):
+                if on_page:
+                    on_page(page_num, doc.page_count)
+                yield page.get_text("text")
+        return
+
+    reader = PyPDF2.PdfReader(io.BytesIO(data))
+    page_count = len(reader.pages)
+    max_workers = max(1, min(PDF_MAX_WORKERS, os.cpu_count() or 1, page_count))
+    if max_workers == 1:
+        # Nothing to parallelize, so iterate the pages of the reader we already have
+        for page_num, page in enumerate(reader.pages, 1):
+            if on_page:
+                on_page(page_num, page_count)
+            yield page.extract_text() or ""
+        return
+
+    with ThreadPoolExecutor(max_workers=max_workers, initializer=_init_pdf_worker, initargs=(data,)) as executor:
+        # Extract one batch of pages at a time so that stopping early leaves the rest untouched
+        for start in range(0, page_count, max_workers):
+            batch = range(start, min(start + max_workers, page_count))
+            for page_num, page_text in zip(batch, executor.map(_extract_page_text, batch)):
+                if on_page:
+                    on_page(page_num + 1, page_count)
+                yield page_text
+
+def collect_up_to(pages, max_chars: int = PDF_MAX_CHARS):
+    """
+    Joins page texts until max_chars characters are collected, then stops consuming pages.
+    Returns the text and whether the budget was hit.
+    """
+    parts = []
+    remaining = max_chars
+    truncated = False
+    for page_text in pages:
+        parts.append(page_text[:remaining])
+        remaining -= len(parts[-1])
+        if remaining <= 0:
+            truncated = True
+            break
+    pages.close() # Release the PDF reader and worker threads right away
+    return PAGE_SEPARATOR.join(parts), truncated
+
+def _normalize(text: str) -> str:
+    """
+    Shrinks extracted text before it is sent to the model: drops header/footer lines that repeat
+    at the top or bottom of many pages, collapses runs of spaces and tabs, and squeezes blank
+    lines down to one.
+    """
+    pages = text.split(PAGE_SEPARATOR)
+    if len(pages) >= BOILERPLATE_MIN_PAGES:
+        page_lines = [[line.strip() for line in page.splitlines()] for page in pages]
+        # Only the first and last few lines of a page can be a header or footer; the same text in
+        # the body (e.g. "Deductible $500" on every page of a schedule) is content and stays
+        page_edges = []
+        for lines in page_lines:
+            filled = [i for i, line in enumerate(lines) if line]
+            page_edges.append(set(filled[:BOILERPLATE_EDGE_LINES] + filled[-BOILERPLATE_EDGE_LINES:]))
+        # Count each line at most once per page
+        line_pages = Counter(line for lines, edges in zip(page_lines, page_edges) for line in {lines[i] for i in edges})
+        max_pages = BOILERPLATE_PAGE_RATIO * len(pages)
+        boilerplate = {line for line, count in line_pages.items() if count >= BOILERPLATE_MIN_REPEATS and count > max_pages}
+        pages = [
+            "\n".join(line for i, line in enumerate(lines) if i not in edges or line not in boilerplate)
+            for lines, edges in zip(page_lines, page_edges)
+        ]
+    text = "\n\n".join(pages)
+    text = _SPACES.sub(" ", text)
+    text = _BLANK_LINES.sub("\n\n", text)
+    return text.strip()
+
+def _fit_budget(text: str, truncated: bool = False):
     """
-    Extracts text content from an uploaded PDF file.
+    Cuts normalized text down to MAX_DOCUMENT_CHARS. Returns the text and whether anything was cut.
+    """
+    return text[:MAX_DOCUMENT_CHARS], truncated or len(text) > MAX_DOCUMENT_CHARS
+
+def _file_digest(buf: bytes) -> bytes:
+    return hashlib.blake2b(buf, digest_size=16).digest()
+
+# Keyed by the digest only; the leading underscore keeps Streamlit from hashing the file bytes again.
+# The progress bar is created inside the function so Streamlit can replay it on cache hits.
+@st.cache_data(max_entries=PDF_CACHE_ENTRIES, show_spinner=False)
+def _extract_cached(digest: bytes, _data: bytes):
     """
+    Extracts and normalizes the text of a PDF once per distinct file content. Returns the text,
+    whether it was cut to the character budget, and the error message if the PDF could not be read.
+    """
+    progress_bar = st.progress(0.0, text="Extracting text from PDF...")
     try:
-        pdf_reader = PyPDF2.PdfReader(uploaded_file)
-        text = ""
-        for page_num in range(len(pdf_reader.pages)):
-            text += pdf_reader.pages[page_num].extract_text()
-        return text
+        text, truncated = collect_up_to(extract_text_from_pdf(
+            io.BytesIO(_data),
+            on_page=lambda done, total: progress_bar.progress(done / total, text=f"Extracting page {done} of {total}...")
+        ))
     except Exception as e:
-        st.error(f"Error reading PDF file: {e}")
-        return None
+        return "", False, f"Error reading PDF file: {e}"
+    finally:
+        progress_bar.empty()
+    return (*_fit_budget(_normalize(text), truncated), None)
+
+def _extract_content(uploaded_file):
+    """
+    Returns the normalized text of an uploaded .txt or .pdf file, whether it was cut to the
+    character budget, and the error message if the file could not be read.
+    """
+    if uploaded_file.type == "text/plain":
+        try:
+            text = io.StringIO(uploaded_file.getvalue().decode("utf-8")).read()
+        except UnicodeDecodeError as e:
+            return "", False, f"Error reading text file: {e}"
+        return (*_fit_budget(_normalize(text)), None)
+    data = uploaded_file.getvalue()
+    return _extract_cached(_file_digest(data), data)
 
 # --- Streamlit UI ---
-st.set_page_config(page_title="Insurance Document Summarizer", layout="centered")
+STYLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".streamlit", "style.css")
+
+MIN_DOCUMENT_CHARS = 200 # Shorter documents are rejected without calling the API
+_INSURANCE_KEYWORDS = re.compile(r"policy|insurance|coverage|premium|insured|claim", re.IGNORECASE)
+
+# Rows of the policy details table, in display order
+POLICY_DETAIL_LABELS = [
+    ("policyNumber", "Policy Number"),
+    ("policyHolder", "Policy Holder"),
+    ("effectiveDate", "Effective Date"),
+    ("expirationDate", "Expiration Date"),
+    ("premium", "Premium")
+]
+
+SUMMARY_SECTIONS = ["summary", "coverages", "exclusions", "policyDetails"]
 
-st.markdown(
+def _section_markdown(name: str, value) -> str:
     """
-    <style>
-    .main {
-        background-color: #f0f2f6;
-        padding: 20px;
-        border-radius: 10px;
-    }
-    h1 {
-        color: #1e3a8a; /* Dark blue */
-        text-align: center;
-        margin-bottom: 30px;
-    }
-    .stFileUploader > div > button {
-        background-color: #4CAF50; /* Green */
-        color: white;
-        border-radius: 8px;
-        padding: 10px 20px;
-        font-size: 16px;
-        border: none;
-        cursor: pointer;
-        transition: background-color 0.3s ease;
-    }
-    .stFileUploader > div > button:hover {
-        background-color: #45a049;
-    }
-    .stButton > button {
-        background-color: #1e3a8a; /* Dark blue */
-        color: white;
-        border-radius: 8px;
-        padding: 10px 20px;
-        font-size: 16px;
-        border: none;
-        cursor: pointer;
-        transition: background-color 0.3s ease;
-        display: block;
-        margin: 20px auto;
-    }
-    .stButton > button:hover {
-        background-color: #15306b;
-    }
-    .summary-section {
-        background-color: #ffffff;
-        padding: 20px;
-        border-radius: 10px;
-        box-shadow: 0 4px 8px rgba(0, 0, 0, 0.1);
-        margin-top: 30px;
-    }
-    .summary-section h3 {
-        color: #1e3a8a;
-        border-bottom: 2px solid #e0e0e0;
-        padding-bottom: 10px;
-        margin-bottom: 15px;
-    }
-    .summary-section ul {
-        list-style-type: disc;
-        margin-left: 20px;
-        padding-left: 0;
-    }
-    .summary-section li {
-        margin-bottom: 8px;
-        color: #333;
-    }
-    .policy-details-table {
-        width: 100%;
-        border-collapse: collapse;
-        margin-top: 15px;
-    }
-    .policy-details-table th, .policy-details-table td {
-        border: 1px solid #ddd;
-        padding: 8px;
-        text-align: left;
-    }
-    .policy-details-table th {
-        background-color: #f2f2f2;
-        color: #1e3a8a;
-    }
-    </style>
-    """,
-    unsafe_allow_html=True
-)
+    Builds the markdown of one report section from the matching summary field.
+    """
+    if name == "summary":
+        return f"### Overall Summary\n\n{value or 'N/A'}"
+    if name in ("coverages", "exclusions"):
+        if not value:
+            return f"### {name.capitalize()}\n\nNo specific {name} found or identified."
+        return f"### {name.capitalize()}\n\n" + "\n".join(f"- {item}" for item in value)
+
+    if not value:
+        return "### Policy Details\n\nNo specific policy details found or identified."
+    rows = "".join(
+        f'<tr><td>{label}</td><td>{html.escape(str(value.get(key, "N/A")))}</td></tr>'
+        for key, label in POLICY_DETAIL_LABELS
+    )
+    # Model output comes from the uploaded document, so it is escaped before it goes into HTML.
+    # The table starts at column 0 so the markdown appended after it is not read as a code block
+    details_md = f'### Policy Details\n\n<table class="policy-details-table"><tr><th>Detail</th><th>Value</th></tr>{rows}</table>'
+    if value.get("otherDetails"):
+        details_md += "\n\n#### Other Policy Details\n" + "\n".join(f"- {html.escape(str(detail))}" for detail in value["otherDetails"])
+    return details_md
+
+def _render_section(section_slots: dict, name: str, value):
+    # Each section is a single markdown element, so it costs one message to the frontend.
+    # Only the policy details table needs HTML; the other sections are plain markdown.
+    if name in section_slots:
+        section_slots[name].markdown(_section_markdown(name, value), unsafe_allow_html=name == "policyDetails")
+
+st.set_page_config(page_title="Insurance Document Summarizer", layout="centered")
+
+@st.cache_data(show_spinner=False)
+def _css():
+    with open(STYLE_PATH, encoding="utf-8") as f:
+        return f.read()
+
+st.markdown(f"<style>{_css()}</style>", unsafe_allow_html=True)
+
+with st.sidebar:
+    if st.button("Clear cache"):
+        st.cache_data.clear()
+        # Extract the current upload again too, instead of reusing the text kept for it
+        st.session_state.pop("_file_id", None)
+        st.session_state.pop("_file_content", None)
+        st.success("Cached document text cleared.")
+    # The summary caches are shared by every user (and every replica with Redis), so clearing
+    # them is only offered when an admin token is configured and entered
+    if ADMIN_TOKEN:
+        admin_token = st.text_input("Admin token", type="password")
+        if st.button("Clear shared summary cache"):
+            if hmac.compare_digest(admin_token.encode(), ADMIN_TOKEN.encode()):
+                _summary_cache().clear()
+                _semantic_cache().clear()
+                st.success("Cached summaries cleared.")
+            else:
+                st.error("Invalid admin token.")
 
 st.title("📄 Insurance Document Summarizer")
 st.write("Upload your insurance document (text file or PDF) and get a quick summary of its key details.")
@@ -226,74 +937,56 @@ uploaded_file = st.file_uploader("Choose a document (.txt or .pdf)", type=["txt"
 
 if uploaded_file is not None:
     file_content = None
-    if uploaded_file.type == "text/plain":
-        file_content = io.StringIO(uploaded_file.getvalue().decode("utf-8")).read()
-    elif uploaded_file.type == "application/pdf":
-        file_content = extract_text_from_pdf(uploaded_file)
+    truncated = False
+    extraction_error = None
+    if uploaded_file.type in ("text/plain", "application/pdf"):
+        # Reruns caused by other widgets reuse the text (or the error) extracted for this upload
+        if st.session_state.get("_file_id") != uploaded_file.file_id:
+            st.session_state["_file_id"] = uploaded_file.file_id
+            st.session_state["_file_content"] = _extract_content(uploaded_file)
+        file_content, truncated, extraction_error = st.session_state["_file_content"]
     else:
-        st.error("Unsupported file type. Please upload a .txt or .pdf file.")
+        extraction_error = "Unsupported file type. Please upload a .txt or .pdf file."
 
-    if file_content:
+    if extraction_error:
+        st.error(extraction_error)
+    elif file_content:
+        if truncated:
+            st.warning(f"The document is too long; only its first {MAX_DOCUMENT_CHARS:,} characters will be summarized.")
         st.subheader("Uploaded Document Preview:")
         with st.expander("Click to view document content"):
             st.text_area("Document Content", file_content, height=300, disabled=True)
 
         if st.button("Summarize Document"):
-            if file_content:
+            # Cheap pre-flight check so near-empty or unrelated documents never cost an API call
+            if len(file_content) < MIN_DOCUMENT_CHARS or not _INSURANCE_KEYWORDS.search(file_content):
+                st.warning("Document does not appear to be an insurance policy.")
+            else:
                 with st.spinner("Summarizing your document... This may take a moment."):
                     # Clear previous summary if a new file is uploaded or button is clicked again
                     if 'summary_data' in st.session_state:
                         del st.session_state['summary_data']
 
-                    summary_data = summarize_document(file_content)
-                    st.session_state['summary_data'] = summary_data # Store in session state
-
-                    if summary_data:
+                    report = st.empty()
+                    with report.container():
                         st.markdown('<div class="summary-section">', unsafe_allow_html=True)
                         st.subheader("Summary Report")
-
-                        st.markdown("### Overall Summary")
-                        st.write(summary_data.get("summary", "N/A"))
-
-                        st.markdown("### Coverages")
-                        if summary_data.get("coverages"):
-                            for coverage in summary_data["coverages"]:
-                                st.markdown(f"- {coverage}")
-                        else:
-                            st.write("No specific coverages found or identified.")
-
-                        st.markdown("### Exclusions")
-                        if summary_data.get("exclusions"):
-                            for exclusion in summary_data["exclusions"]:
-                                st.markdown(f"- {exclusion}")
-                        else:
-                            st.write("No specific exclusions found or identified.")
-
-                        st.markdown("### Policy Details")
-                        policy_details = summary_data.get("policyDetails", {})
-                        if policy_details:
-                            st.markdown(f"""
-                            <table class="policy-details-table">
-                                <tr><th>Detail</th><th>Value</th></tr>
-                                <tr><td>Policy Number</td><td>{policy_details.get("policyNumber", "N/A")}</td></tr>
-                                <tr><td>Policy Holder</td><td>{policy_details.get("policyHolder", "N/A")}</td></tr>
-                                <tr><td>Effective Date</td><td>{policy_details.get("effectiveDate", "N/A")}</td></tr>
-                                <tr><td>Expiration Date</td><td>{policy_details.get("expirationDate", "N/A")}</td></tr>
-                                <tr><td>Premium</td><td>{policy_details.get("premium", "N/A")}</td></tr>
-                            </table>
-                            """, unsafe_allow_html=True)
-
-                            if policy_details.get("otherDetails"):
-                                st.markdown("#### Other Policy Details")
-                                for detail in policy_details["otherDetails"]:
-                                    st.markdown(f"- {detail}")
-                        else:
-                            st.write("No specific policy details found or identified.")
+                        # One slot per field, filled in as soon as the field has been streamed
+                        section_slots = {name: st.empty() for name in SUMMARY_SECTIONS}
                         st.markdown('</div>', unsafe_allow_html=True)
+
+                    summary_data = summarize_document(
+                        file_content,
+                        on_field=lambda name, value: _render_section(section_slots, name, value)
+                    )
+                    st.session_state['summary_data'] = summary_data # Store in session state
+
+                    if summary_data:
+                        for name in SUMMARY_SECTIONS:
+                            _render_section(section_slots, name, summary_data.get(name))
                     else:
+                        report.empty()
                         st.error("Failed to generate summary. Please try again or check the document content.")
-            else:
-                st.warning("Could not extract content from the uploaded document.")
     else:
         st.warning("Please upload a document to summarize.")
 else:
@@ -301,4 +994,8 @@ else:
     st.markdown("""
     **Note:** This application now supports plain text files (.txt) and PDF files (.pdf).
     For best results, ensure your document is clear and well-formatted.
-    """)
\ No newline at end of file
+    """)
+
+with st.sidebar:
+    cache_stats = st.session_state.get("cache_stats", {"hits": 0, "misses": 0})
+    st.caption(f"Summary cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses this session")
\ No newline at end of file
@@ -0,0 +1,53 @@
+import asyncio
+import unittest
+from unittest import mock
+
+import streamlit as st
+
+# The app reads its API key at import time
+with mock.patch.object(st, "secrets", {"GEMINI_API_KEY": "test"}):
+    import gemini1
+
+
+class ChunkTest(unittest.TestCase):
+    def test_chunks_cover_the_whole_text(self):
+        text = "".join(chr(ord("a") + i % 26) for i in range(50_123))
+        for size, overlap in ((8000, 400), (1000, 0), (7, 3)):
+            with self.subTest(size=size, overlap=overlap):
+                chunks = gemini1._chunk(text, size, overlap)
+                self.assertTrue(all(len(chunk) <= size for chunk in chunks))
+                for previous, chunk in zip(chunks, chunks[1:]):
+                    self.assertEqual(previous[-overlap:] if overlap else "", chunk[:overlap])
+                rebuilt = chunks[0] + "".join(chunk[overlap:] for chunk in chunks[1:])
+                self.assertEqual(rebuilt, text)
+
+    def test_short_text_is_one_chunk(self):
+        self.assertEqual(gemini1._chunk("short"), ["short"])
+        self.assertEqual(gemini1._chunk(""), [""])
+
+
+class SummarizeTextTest(unittest.TestCase):
+    def test_chunk_requests_are_bounded(self):
+        running = 0
+        peak = 0
+        prompts = []
+
+        async def generate_summary(prompt, on_field=None):
+            nonlocal running, peak
+            prompts.append(prompt)
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return {"summary": "", "coverages": [], "exclusions": [], "policyDetails": {}}
+
+        text = "x" * (gemini1.CHUNK_THRESHOLD_CHARS * 2)
+        with mock.patch.object(gemini1, "_generate_summary", generate_summary):
+            gemini1._run(gemini1._summarize_text(text))
+        # One request per chunk plus the merge request
+        self.assertEqual(len(prompts), len(gemini1._chunk(text)) + 1)
+        self.assertEqual(peak, gemini1.MAX_CONCURRENT_CHUNKS)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+from unittest import mock
+
+import streamlit as st
+
+# The app reads its API key at import time
+with mock.patch.object(st, "secrets", {"GEMINI_API_KEY": "test"}):
+    import gemini1
+
+
+def _pages(count: int) -> str:
+    return gemini1.PAGE_SEPARATOR.join(
+        f"ACME Insurance\nClause {page}: coverage text {page}\nPage footer" for page in range(1, count + 1)
+    )
+
+
+def _schedule(count: int) -> str:
+    return gemini1.PAGE_SEPARATOR.join(
+        f"ACME Insurance\nPolicy Schedule\n\nItem {page}\nCovered\nDeductible $500\nLimit {page}0,000\nPage footer"
+        for page in range(1, count + 1)
+    )
+
+
+class NormalizeTest(unittest.TestCase):
+    def test_short_documents_keep_their_content(self):
+        for count in (1, 2, 3, 4):
+            with self.subTest(pages=count):
+                text = gemini1._normalize(_pages(count))
+                for page in range(1, count + 1):
+                    self.assertIn(f"Clause {page}: coverage text {page}", text)
+
+    def test_repeated_lines_are_dropped_from_long_documents(self):
+        text = gemini1._normalize(_pages(10))
+        self.assertNotIn("ACME Insurance", text)
+        self.assertNotIn("Page footer", text)
+        for page in range(1, 11):
+            self.assertIn(f"Clause {page}: coverage text {page}", text)
+
+    def test_repeated_body_lines_are_kept(self):
+        for count in (5, 10):
+            with self.subTest(pages=count):
+                text = gemini1._normalize(_schedule(count))
+                self.assertNotIn("ACME Insurance", text)
+                self.assertNotIn("Page footer", text)
+                self.assertEqual(text.count("Covered"), count)
+                self.assertEqual(text.count("Deductible $500"), count)
+
+    def test_edge_lines_on_two_pages_are_kept(self):
+        pages = [f"Clause {page}\nbody {page}\nmore {page}\nend {page}" for page in range(1, 6)]
+        pages[0] = "Fire damage\n" + pages[0]
+        pages[3] = "Fire damage\n" + pages[3]
+        text = gemini1._normalize(gemini1.PAGE_SEPARATOR.join(pages))
+        self.assertEqual(text.count("Fire damage"), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
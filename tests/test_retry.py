@@ -0,0 +1,73 @@
+import unittest
+from unittest import mock
+
+import httpx
+import streamlit as st
+
+# The app reads its API key at import time
+with mock.patch.object(st, "secrets", {"GEMINI_API_KEY": "test"}):
+    import gemini1
+
+API_URL = "https://example.test/generate"
+
+
+class PostRetryTest(unittest.TestCase):
+    def setUp(self):
+        self.outcomes = [] # One response status or exception per expected request
+        self.requests = 0
+        client = httpx.AsyncClient(transport=httpx.MockTransport(self._handle))
+        patches = [
+            mock.patch.object(gemini1, "_client", lambda: client),
+            mock.patch.object(gemini1, "RETRY_BACKOFF", 0)
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def _handle(self, request):
+        self.requests += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return httpx.Response(outcome, json={"status": outcome})
+
+    def _post(self, **kwargs):
+        return gemini1._run(gemini1._post(API_URL, {}, **kwargs))
+
+    def test_retryable_statuses_are_retried(self):
+        self.outcomes = [429, 503, 200]
+        self.assertEqual(self._post(), {"status": 200})
+        self.assertEqual(self.requests, 3)
+
+    def test_transport_errors_are_retried(self):
+        self.outcomes = [httpx.ConnectError("refused"), httpx.ReadTimeout("timed out"), 200]
+        self.assertEqual(self._post(), {"status": 200})
+        self.assertEqual(self.requests, 3)
+
+    def test_last_failure_is_raised(self):
+        self.outcomes = [503] * gemini1.MAX_RETRIES + [httpx.ConnectError("refused")]
+        with self.assertRaises(httpx.ConnectError):
+            self._post()
+        self.assertEqual(self.requests, gemini1.MAX_RETRIES + 1)
+
+        self.requests = 0
+        self.outcomes = [httpx.ConnectError("refused")] * gemini1.MAX_RETRIES + [503]
+        with self.assertRaises(httpx.HTTPStatusError):
+            self._post()
+        self.assertEqual(self.requests, gemini1.MAX_RETRIES + 1)
+
+    def test_other_errors_are_not_retried(self):
+        self.outcomes = [400]
+        with self.assertRaises(httpx.HTTPStatusError):
+            self._post()
+        self.assertEqual(self.requests, 1)
+
+    def test_retries_can_be_turned_off(self):
+        self.outcomes = [httpx.ConnectError("refused")]
+        with self.assertRaises(httpx.ConnectError):
+            self._post(retries=0)
+        self.assertEqual(self.requests, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,135 @@
+import queue
+import threading
+import unittest
+from unittest import mock
+
+import httpx
+import orjson
+import streamlit as st
+
+# The app reads its API key at import time
+with mock.patch.object(st, "secrets", {"GEMINI_API_KEY": "test"}):
+    import gemini1
+
+SUMMARY = {
+    "summary": "Home policy",
+    "coverages": ["Fire", "Theft"],
+    "exclusions": ["Flood"],
+    "policyDetails": {"policyNumber": "P-1"}
+}
+STREAM_URL = "https://example.test/stream"
+
+
+def _sse(*texts: str) -> list:
+    return [b"data: " + orjson.dumps({"candidates": [{"content": {"parts": [{"text": text}]}}]}) + b"\n\n" for text in texts]
+
+
+def _split(text: str, *markers: str) -> list:
+    """
+    Cuts text right after each marker, the way the model streams an answer in pieces.
+    """
+    pieces = []
+    for marker in markers:
+        end = text.index(marker) + len(marker)
+        pieces.append(text[:end])
+        text = text[end:]
+    return pieces + [text]
+
+
+class StreamTest(unittest.TestCase):
+    def setUp(self):
+        self.responses = [] # One async event iterator factory per expected request
+        self.sent = [] # Number of SSE events the server had sent when each field arrived
+        self.events_sent = 0
+        client = httpx.AsyncClient(transport=httpx.MockTransport(self._handle))
+        patches = [
+            mock.patch.object(gemini1, "_client", lambda: client),
+            mock.patch.object(gemini1, "RETRY_BACKOFF", 0)
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def _handle(self, request):
+        return httpx.Response(200, content=self.responses.pop(0)())
+
+    def _serve(self, events, fail_after=None):
+        async def body():
+            for i, event in enumerate(events):
+                if i == fail_after:
+                    raise httpx.ReadError("connection reset")
+                self.events_sent += 1
+                yield event
+        self.responses.append(body)
+
+    def _stream(self, on_field):
+        return gemini1._run(gemini1._stream(STREAM_URL, {"contents": []}, on_field))
+
+    def test_fields_arrive_in_order_as_soon_as_complete(self):
+        text = orjson.dumps(SUMMARY).decode()
+        self._serve(_sse(*_split(text, '"Home policy",', '"Theft"],', '"Flood"],')))
+        fields = []
+
+        def on_field(name, value):
+            fields.append((name, value))
+            self.sent.append(self.events_sent)
+
+        answer, result = self._stream(on_field)
+        self.assertEqual(orjson.loads(answer), SUMMARY)
+        self.assertEqual(fields, list(SUMMARY.items()))
+        # Each field is passed on while the rest of the answer is still being streamed
+        self.assertEqual(self.sent, [2, 3, 4, 4])
+        self.assertIn("candidates", result)
+
+    def test_fenced_answer_is_returned_whole(self):
+        text = "```json\n" + orjson.dumps(SUMMARY).decode() + "\n```"
+        self._serve(_sse(*_split(text, "json\n", '"Theft"],')))
+        fields = []
+        summary = gemini1._run(gemini1._generate_summary("prompt", lambda name, value: fields.append(name)))
+        self.assertEqual(summary, SUMMARY)
+        self.assertEqual(fields, []) # Not streamable JSON, so nothing was passed on early
+
+    def test_stream_cut_off_midway_is_retried(self):
+        events = _sse(*_split(orjson.dumps(SUMMARY).decode(), '"Home policy",', '"Theft"],'))
+        self._serve(events, fail_after=2)
+        self._serve(events)
+        fields = []
+        answer, _ = self._stream(lambda name, value: fields.append(name))
+        self.assertEqual(orjson.loads(answer), SUMMARY)
+        # Fields rendered before the failure are sent again by the retried request
+        self.assertEqual(fields, ["summary", "summary", "coverages", "exclusions", "policyDetails"])
+
+    def test_stream_failing_every_attempt_raises(self):
+        events = _sse(orjson.dumps(SUMMARY).decode())
+        for _ in range(gemini1.MAX_RETRIES + 1):
+            self._serve(events, fail_after=0)
+        with self.assertRaises(httpx.TransportError):
+            self._stream(lambda name, value: None)
+        self.assertEqual(self.responses, [])
+
+
+class RunTest(unittest.TestCase):
+    def test_events_are_handled_on_the_calling_thread(self):
+        events = queue.Queue()
+        handled = []
+
+        async def produce():
+            for i in range(5):
+                events.put((i,))
+            return "done"
+
+        result = gemini1._run(produce(), events, lambda i: handled.append((i, threading.current_thread())))
+        self.assertEqual(result, "done")
+        self.assertEqual([i for i, _ in handled], list(range(5)))
+        self.assertTrue(all(thread is threading.current_thread() for _, thread in handled))
+
+    def test_errors_reach_the_caller(self):
+        async def fail():
+            raise ValueError("boom")
+
+        with self.assertRaises(ValueError):
+            gemini1._run(fail(), queue.Queue(), lambda *event: None)
+
+
+if __name__ == "__main__":
+    unittest.main()